@@ -0,0 +1,22 @@
+#!/bin/sh
+# Build shkolo-cli.pyz: the Python client as a zipapp that ships only
+# bytecode compiled at optimisation level 2 (as with -OO), so startup
+# skips parsing and compiling shkolo-cli.py.
+#
+# The .pyc inside is tied to the Python minor version used to build it;
+# rebuild after upgrading Python.
+set -e
+
+PYTHON=${PYTHON:-python3}
+OUT=${1:-shkolo-cli.pyz}
+
+BUILD_DIR=$(mktemp -d)
+trap 'rm -rf "$BUILD_DIR"' EXIT
+
+mkdir "$BUILD_DIR/app"
+"$PYTHON" -c 'import py_compile, sys; py_compile.compile(sys.argv[1], cfile=sys.argv[2], doraise=True, optimize=2)' \
+    shkolo-cli.py "$BUILD_DIR/app/shkolo_cli.pyc"
+printf 'from shkolo_cli import main\n\nmain()\n' > "$BUILD_DIR/app/__main__.py"
+
+"$PYTHON" -m zipapp "$BUILD_DIR/app" -p "/usr/bin/env python3" -c -o "$OUT"
+echo "Built $OUT"
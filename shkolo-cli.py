@@ -3,102 +3,382 @@
 Shkolo CLI - Command-line client for Shkolo API
 """
 
-import argparse
+import heapq
 import json
+import operator
 import os
 import sys
-from datetime import datetime, timedelta
-from getpass import getpass
+import threading
+import time
+from datetime import date as _date, datetime, timedelta
 from pathlib import Path
+from types import SimpleNamespace
+from urllib.parse import urlencode
 
-import requests
+# orjson is optional; both backends raise a json.JSONDecodeError subclass
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def _dump_to(stream, obj, indent=True):
+        """Write obj as UTF-8 JSON to a binary stream, indented or compact."""
+        stream.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0))
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+
+    def _dump_to(stream, obj, indent=True):
+        """Write obj as UTF-8 JSON to a binary stream, indented or compact."""
+        if indent:
+            encoder = json.JSONEncoder(indent=2, ensure_ascii=False)
+        else:
+            encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+        # Stream chunks so large responses are never held as one string
+        for chunk in encoder.iterencode(obj):
+            stream.write(chunk.encode())
 
 # Configuration
 API_BASE_URL = "https://api.shkolo.bg"
 CONFIG_DIR = Path.home() / ".shkolo"
 TOKEN_FILE = CONFIG_DIR / "token.json"
+CACHE_FILE = CONFIG_DIR / "cache.json"
+SOCKET_FILE = CONFIG_DIR / "cli.sock"
 USER_AGENT = "Shkolo-CLI/1.0"
+FETCH_WORKERS = 8  # Must not exceed the session's pool_maxsize
+SERVE_CLIENT_TIMEOUT = 10  # Seconds a --serve client gets to send its request or take its reply
+
+# Response cache TTLs (seconds)
+PUPILS_TTL = 300
+SCHEDULE_TTL = 30
+GRADES_TTL = 60
+ABSENCES_TTL = 60
+HOMEWORK_LIST_TTL = 60
+CLASS_YEARS_TTL = 3600
+# Older entries are pruned on save and never served, not even as a fallback
+CACHE_MAX_AGE = 86400
 IOS_APP_STORAGE = Path.home() / "Library/Containers/DD1CC5D9-F40E-415C-8E47-094321279222/Data/Library/Application Support/com.shkolo.mobileapp/RCTAsyncLocalStorage_V1/manifest.json"
 
+# today_iso() cache: the value stays valid until local midnight
+_today_cache = {"until": 0.0, "val": ""}
+
+
+def today_iso():
+    """Return today's date as YYYY-MM-DD, computed at most once per day."""
+    now = time.time()
+    if now >= _today_cache["until"]:
+        today = _date.today()
+        _today_cache["val"] = today.isoformat()
+        _today_cache["until"] = time.mktime((today + timedelta(days=1)).timetuple())
+    return _today_cache["val"]
+
+
+def _die(message):
+    """Print an error message to stderr and exit with status 1."""
+    sys.stderr.write(message)
+    sys.stderr.write("\n")
+    sys.exit(1)
+
+
+def write_private_file(path, data):
+    """Atomically replace path with data, readable only by the owner."""
+    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+    # Per-process temp name: the --serve process and one-shot runs may
+    # write the same file at once
+    tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def decode_body(response):
+    """Decode a JSON response body, or return None for an empty body.
+
+    Non-JSON error pages also decode to None; a successful response that
+    is not JSON raises json.JSONDecodeError.
+    """
+    if not response.content:
+        return None
+    if response.ok or "json" in response.headers.get("Content-Type", ""):
+        return _loads(response.content)
+    return None
+
 
 class ShkoloClient:
     def __init__(self):
         self.token = None
         self.school_year = None
         self.user_data = None
+        self._cache = None  # endpoint -> {"ts", "etag", "last_modified", "body"}, loaded lazily
+        self._cache_lock = threading.Lock()
+        self._cache_dirty = False
+        self._stale_notice_shown = False
+        self._headers_auth = None
+        self._headers_unauth = None
+        self._session = None
+        self._session_lock = threading.Lock()
         self.load_token()
 
+    @property
+    def session(self):
+        """HTTP session, created on first use so offline commands never import requests."""
+        with self._session_lock:
+            if self._session is None:
+                self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        """Create the pooled, retrying HTTP session shared by all requests."""
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util import make_headers
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        session.headers.update({
+            "Accept": "application/json",
+            # Only advertises codecs urllib3 can decode (br needs brotli installed)
+            "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+            "User-Agent": USER_AGENT,
+            "language": "bg"
+        })
+        # Transient failures are retried by urllib3; POST is left out since
+        # it is not idempotent. After the last attempt the 5xx response is
+        # returned as-is rather than raised.
+        retry_options = dict(
+            total=3,
+            connect=3,
+            read=2,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(("GET", "PUT", "DELETE")),
+            raise_on_status=False
+        )
+        try:
+            retry = Retry(backoff_jitter=0.3, **retry_options)
+        except TypeError:
+            # urllib3 < 2.0 has no jitter support
+            retry = Retry(**retry_options)
+
+        session.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=retry
+        ))
+        return session
+
     def load_token(self):
         """Load saved token from file."""
         if TOKEN_FILE.exists():
             try:
-                with open(TOKEN_FILE) as f:
-                    data = json.load(f)
+                with open(TOKEN_FILE, "rb") as f:
+                    data = _loads(f.read())
                     self.token = data.get("token")
                     self.school_year = data.get("school_year")
                     self.user_data = data.get("user_data")
             except (json.JSONDecodeError, IOError):
                 pass
+        self._rebuild_headers()
 
     def save_token(self):
         """Save token to file."""
-        CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-        with open(TOKEN_FILE, "w") as f:
-            json.dump({
-                "token": self.token,
-                "school_year": self.school_year,
-                "user_data": self.user_data
-            }, f, indent=2)
-        os.chmod(TOKEN_FILE, 0o600)
+        write_private_file(TOKEN_FILE, _dumps({
+            "token": self.token,
+            "school_year": self.school_year,
+            "user_data": self.user_data
+        }))
+        self._rebuild_headers()
+        self.clear_cache()
 
     def clear_token(self):
         """Remove saved token."""
-        if TOKEN_FILE.exists():
-            TOKEN_FILE.unlink()
+        TOKEN_FILE.unlink(missing_ok=True)
         self.token = None
         self.school_year = None
         self.user_data = None
+        self._rebuild_headers()
+        self.clear_cache()
 
-    def get_headers(self, authorized=True):
-        """Get request headers."""
+    def load_cache(self):
+        """Load the response cache from file."""
+        self._cache = {}
+        if CACHE_FILE.exists():
+            try:
+                with open(CACHE_FILE, "rb") as f:
+                    data = _loads(f.read())
+                self._cache = {k: v for k, v in data.items() if isinstance(v, dict) and "ts" in v}
+            except (json.JSONDecodeError, IOError, AttributeError):
+                pass
+
+    def save_cache(self):
+        """Save the response cache to file, pruning entries past CACHE_MAX_AGE."""
+        cutoff = time.time() - CACHE_MAX_AGE
+        self._cache = {k: v for k, v in self._cache.items() if v["ts"] > cutoff}
+        write_private_file(CACHE_FILE, _dumps(self._cache))
+        self._cache_dirty = False
+
+    def flush_cache(self):
+        """Save the response cache if it changed; called once per command."""
+        with self._cache_lock:
+            if self._cache_dirty:
+                self.save_cache()
+            self._stale_notice_shown = False
+
+    def clear_cache(self):
+        """Drop cached responses (they belong to the previous session)."""
+        CACHE_FILE.unlink(missing_ok=True)
+        self._cache = {}
+        self._cache_dirty = False
+
+    def _rebuild_headers(self):
+        """Rebuild the per-request headers; call whenever token or school_year change."""
         headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "User-Agent": USER_AGENT,
-            "language": "bg"
+            "Content-Type": "application/json"
         }
-        if authorized and self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
         if self.school_year:
             headers["School-Year"] = str(self.school_year)
-        return headers
+        self._headers_unauth = headers
+        if self.token:
+            self._headers_auth = {**headers, "Authorization": f"Bearer {self.token}"}
+        else:
+            self._headers_auth = headers
 
-    def request(self, method, endpoint, data=None, authorized=True):
-        """Make an API request."""
+    def get_headers(self, authorized=True):
+        """Get per-request headers (static ones live on the session).
+
+        The returned dict is shared between requests and must not be modified.
+        """
+        return self._headers_auth if authorized else self._headers_unauth
+
+    def _raw_request(self, method, endpoint, data=None, authorized=True, params=None, headers=None):
+        """Make an API request and return the undecoded response."""
         url = f"{API_BASE_URL}{endpoint}"
-        headers = self.get_headers(authorized)
+        request_headers = self.get_headers(authorized)
+        if headers:
+            request_headers = {**request_headers, **headers}
+
+        response = self.session.request(method, url, headers=request_headers, params=params, json=data, timeout=30)
+
+        if response.status_code == 401:
+            print("Error: Session expired. Please login again.", file=sys.stderr)
+            self.clear_token()
+            sys.exit(1)
+
+        return response
+
+    def _send(self, method, endpoint, data=None, authorized=True, params=None):
+        """Make an API request, raising on network errors."""
+        response = self._raw_request(method, endpoint, data, authorized, params)
+        return decode_body(response), response.status_code
+
+    def request(self, method, endpoint, data=None, authorized=True, params=None):
+        """Make an API request, exiting once retries are exhausted."""
+        from requests import RequestException
 
         try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, timeout=30)
-            elif method == "POST":
-                response = requests.post(url, headers=headers, json=data, timeout=30)
-            elif method == "PUT":
-                response = requests.put(url, headers=headers, json=data, timeout=30)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers, timeout=30)
-            else:
-                raise ValueError(f"Unknown method: {method}")
+            return self._send(method, endpoint, data, authorized, params)
+        except (RequestException, json.JSONDecodeError) as e:
+            _die(f"Error: Network request failed: {e}")
 
-            if response.status_code == 401:
-                print("Error: Session expired. Please login again.", file=sys.stderr)
-                self.clear_token()
-                sys.exit(1)
+    def cached_get(self, endpoint, ttl, params=None):
+        """GET an endpoint, reusing a cached response younger than ttl seconds.
 
-            return response.json(), response.status_code
-        except requests.RequestException as e:
-            print(f"Error: Network request failed: {e}", file=sys.stderr)
-            sys.exit(1)
+        If the API is unreachable or failing, a stale cached response is
+        returned instead of aborting.
+        """
+        from requests import RequestException
+
+        with self._cache_lock:
+            if self._cache is None:
+                self.load_cache()
+        key = f"{endpoint}?{urlencode(params)}" if params else endpoint
+        entry = self._cache.get(key)
+        if entry and time.time() - entry["ts"] < ttl:
+            return entry["body"], 200
+
+        # Revalidate an expired entry so an unchanged resource costs a 304
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            raw = self._raw_request("GET", endpoint, params=params, headers=headers)
+            status = raw.status_code
+            if status == 304 and entry:
+                with self._cache_lock:
+                    entry["ts"] = time.time()
+                    self._cache_dirty = True
+                return entry["body"], 200
+            response = decode_body(raw)
+        except (RequestException, json.JSONDecodeError) as e:
+            if self._use_stale(entry):
+                return entry["body"], 200
+            _die(f"Error: Network request failed: {e}")
+
+        if status == 200 and response is not None:
+            with self._cache_lock:
+                self._cache[key] = {
+                    "ts": time.time(),
+                    "etag": raw.headers.get("ETag"),
+                    "last_modified": raw.headers.get("Last-Modified"),
+                    "body": response
+                }
+                self._cache_dirty = True
+        elif status >= 500 and self._use_stale(entry):
+            return entry["body"], 200
+        return response, status
+
+    def _use_stale(self, entry):
+        """Check whether an expired entry may stand in for a failed request.
+
+        Notes the age of the data on stderr, once per command.
+        """
+        if not entry or time.time() - entry["ts"] > CACHE_MAX_AGE:
+            return False
+        with self._cache_lock:
+            if not self._stale_notice_shown:
+                self._stale_notice_shown = True
+                fetched = datetime.fromtimestamp(entry["ts"]).strftime("%Y-%m-%d %H:%M")
+                print(f"Warning: API unavailable, showing cached data from {fetched}", file=sys.stderr)
+        return True
+
+    def _fetch(self, endpoint, params=None, ttl=0):
+        """GET an endpoint, through the cache when ttl is set."""
+        if ttl > 0:
+            return self.cached_get(endpoint, ttl, params)
+        return self.request("GET", endpoint, params=params)
+
+    def _get(self, endpoint, params=None, ttl=0):
+        """GET an endpoint, returning the response or None on failure."""
+        response, status = self._fetch(endpoint, params, ttl)
+        if status != 200:
+            return None
+        return response
+
+    def get_many(self, endpoints, params=None, ttl=0):
+        """GET several endpoints concurrently, returning results in input order.
+
+        params is either one dict shared by every endpoint or a list with a
+        dict per endpoint.
+        """
+        endpoints = list(endpoints)
+        if not isinstance(params, list):
+            params = [params] * len(endpoints)
+        if len(endpoints) <= 1:
+            return [self._fetch(endpoint, p, ttl) for endpoint, p in zip(endpoints, params)]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            return list(executor.map(lambda endpoint, p: self._fetch(endpoint, p, ttl), endpoints, params))
 
     def login(self, username, password):
         """Login to Shkolo."""
@@ -110,11 +390,12 @@ class ShkoloClient:
         response, status = self.request("POST", "/v1/auth/login", data, authorized=False)
 
         if status != 200:
-            return False, response.get("message", "Login failed")
+            return False, (response or {}).get("message", "Login failed")
 
-        self.token = response.get("token")
+        self.token = (response or {}).get("token")
         if not self.token:
             return False, "No token received"
+        self._rebuild_headers()
 
         # Get users and years to select school year
         users_response, _ = self.request("GET", "/v1/auth/usersAndYears")
@@ -139,107 +420,84 @@ class ShkoloClient:
             self.request("POST", "/v1/auth/logout")
         self.clear_token()
 
+    def reload_token(self):
+        """Re-read the token file, e.g. after another process logged in or out."""
+        previous = self.token
+        self.token = None
+        self.school_year = None
+        self.user_data = None
+        self.load_token()
+        if self.token != previous:
+            self._cache = None  # Belongs to the previous session; reload from file
+            self._cache_dirty = False
+
     def is_authenticated(self):
         """Check if user is authenticated."""
         return self.token is not None
 
     def get_class_years(self):
         """Get all class years."""
-        response, status = self.request("GET", "/v1/diary/classYears")
-        if status != 200:
-            return None
-        return response
+        return self._get("/v1/diary/classYears", ttl=CLASS_YEARS_TTL)
 
     def get_homework_list(self, class_year_id):
         """Get homework list for a class year."""
-        response, status = self.request("GET", f"/v1/diary/homeworks/list/{class_year_id}")
-        if status != 200:
-            return None
-        return response
+        return self._get(f"/v1/diary/homeworks/list/{class_year_id}", ttl=HOMEWORK_LIST_TTL)
 
     def get_homework_courses(self, class_year_id=None, pupil_id=None):
         """Get homework courses."""
-        params = []
-        if class_year_id:
-            params.append(f"classYearId={class_year_id}")
-        if pupil_id:
-            params.append(f"pupilId={pupil_id}")
-
-        query = "?" + "&".join(params) if params else ""
-        response, status = self.request("GET", f"/v1/diary/homeworks/courses{query}")
-        if status != 200:
-            return None
-        return response
+        params = {k: v for k, v in (("classYearId", class_year_id), ("pupilId", pupil_id)) if v}
+        return self._get("/v1/diary/homeworks/courses", params=params)
 
     def get_schedule_hours(self, date=None):
         """Get schedule hours for a date."""
         if date is None:
-            date = datetime.now().strftime("%Y-%m-%d")
-        response, status = self.request("GET", f"/v1/diary/scheduleHours?date={date}")
-        if status != 200:
-            return None
-        return response
+            date = today_iso()
+        return self._get("/v1/diary/scheduleHours", params={"date": date}, ttl=SCHEDULE_TTL)
 
     def get_pupils(self):
         """Get pupils (for parents)."""
-        response, status = self.request("GET", "/v1/diary/pupils")
-        if status != 200:
+        return self._get("/v1/diary/pupils", ttl=PUPILS_TTL)
+
+    def list_pupils(self):
+        """Get (pupil_id, name) pairs for the account's children, or None on failure."""
+        pupils = self.get_pupils()
+        if pupils is None:
             return None
-        return response
+        return [
+            (pupil_id, pupil.get("target_name", "Unknown"))
+            for pupil_id, pupil in pupils.get("childPupils", {}).items()
+        ]
 
     def get_pupil_schedule(self, pupil_id, date=None):
         """Get schedule for a specific pupil."""
         if date is None:
-            date = datetime.now().strftime("%Y-%m-%d")
-        response, status = self.request("GET", f"/v1/diary/pupils/{pupil_id}/scheduleHours?date={date}")
-        if status != 200:
-            return None
-        return response
+            date = today_iso()
+        return self._get(f"/v1/diary/pupils/{pupil_id}/scheduleHours", params={"date": date}, ttl=SCHEDULE_TTL)
 
     def get_tasks(self):
         """Get assigned tasks (homework)."""
-        response, status = self.request("GET", "/v1/tasks/assigned")
-        if status != 200:
-            return None
-        return response
+        return self._get("/v1/tasks/assigned")
 
     def get_my_tasks(self):
         """Get user's tasks."""
-        response, status = self.request("GET", "/v1/tasks/my-tasks")
-        if status != 200:
-            return None
-        return response
+        return self._get("/v1/tasks/my-tasks")
 
     def get_events(self, school_calendar=False):
         """Get events."""
-        endpoint = "/v1/events"
-        if school_calendar:
-            endpoint += "?is_school_calendar=1"
-        response, status = self.request("GET", endpoint)
-        if status != 200:
-            return None
-        return response
+        params = {"is_school_calendar": 1} if school_calendar else None
+        return self._get("/v1/events", params=params)
 
     def get_grades(self, pupil_id):
         """Get grades for a pupil."""
-        response, status = self.request("GET", f"/v1/diary/pupils/{pupil_id}/grades/summary")
-        if status != 200:
-            return None
-        return response
+        return self._get(f"/v1/diary/pupils/{pupil_id}/grades/summary", ttl=GRADES_TTL)
 
     def get_absences(self, pupil_id):
         """Get absences for a pupil."""
-        response, status = self.request("GET", f"/v1/diary/pupils/{pupil_id}/absences/summary")
-        if status != 200:
-            return None
-        return response
+        return self._get(f"/v1/diary/pupils/{pupil_id}/absences/summary", ttl=ABSENCES_TTL)
 
     def get_notifications(self, page=1):
         """Get notifications."""
-        response, status = self.request("GET", f"/v1/notifications?page={page}")
-        if status != 200:
-            return None
-        return response
+        return self._get("/v1/notifications", params={"page": page})
 
 
 def format_date(date_str):
@@ -253,10 +511,80 @@ def format_date(date_str):
         return date_str
 
 
+# Icon to emoji mapping for junior grades
+GRADE_ICON_MAP = {
+    "starO": "⭐",
+    "star": "⭐",
+    "heartO": "❤️",
+    "heart": "❤️",
+    "smileO": "😊",
+    "smile": "😊",
+    "mehO": "😐",
+    "meh": "😐",
+    "frownO": "😟",
+    "frown": "😟",
+}
+
+
+def iter_grade_container(container):
+    """Iterate grade entries of a term, which can be a dict or a list."""
+    if isinstance(container, dict):
+        return container.values()
+    if isinstance(container, list):
+        return container
+    return ()
+
+
+def extract_grade(grade_info):
+    """Extract grade value, handling both numeric and icon-based systems."""
+    if not isinstance(grade_info, dict):
+        return str(grade_info) if grade_info else None
+    # Try numeric grade first
+    g = grade_info.get("grade") or grade_info.get("grade_raw")
+    if g:
+        return str(g)
+    # For junior grades, use numerical_value (the actual grade number)
+    num = grade_info.get("numerical_value")
+    if num:
+        return str(num)
+    return None
+
+
+def numeric_grades(grades):
+    """Parse the numeric grades of a term, skipping icon-based ones."""
+    numbers = []
+    for g in grades:
+        try:
+            numbers.append(float(g))
+        except ValueError:
+            pass
+    return numbers
+
+
+def extract_final_grade(final_data):
+    """Extract grade value from final grade data."""
+    if not final_data:
+        return None
+    if isinstance(final_data, dict):
+        for key, val in final_data.items():
+            if isinstance(val, dict):
+                return val.get("grade")
+            return val
+    elif isinstance(final_data, list):
+        for item in final_data:
+            if isinstance(item, dict):
+                return item.get("grade")
+            return item
+    return str(final_data)
+
+
 def cmd_login(client, args):
     """Handle login command."""
     username = args.username or input("Username: ")
-    password = args.password or getpass("Password: ")
+    password = args.password
+    if not password:
+        from getpass import getpass
+        password = getpass("Password: ")
 
     success, message = client.login(username, password)
     if success:
@@ -268,8 +596,7 @@ def cmd_login(client, args):
                     roles = [r.get("role_name", "") for r in user["roles"]]
                     print(f"  Roles: {', '.join(roles)}")
     else:
-        print(f"Login failed: {message}", file=sys.stderr)
-        sys.exit(1)
+        _die(f"Login failed: {message}")
 
 
 def cmd_logout(client, args):
@@ -282,12 +609,11 @@ def cmd_import_token(client, args):
     """Import token from iOS Shkolo app."""
     if not IOS_APP_STORAGE.exists():
         print("Error: Shkolo iOS app data not found.", file=sys.stderr)
-        print("Make sure the Shkolo app is installed and you've logged in.", file=sys.stderr)
-        sys.exit(1)
+        _die("Make sure the Shkolo app is installed and you've logged in.")
 
     try:
-        with open(IOS_APP_STORAGE) as f:
-            data = json.load(f)
+        with open(IOS_APP_STORAGE, "rb") as f:
+            data = _loads(f.read())
 
         token = data.get("@ShkoloStore:Token")
         user_id = data.get("@ShkoloStore:CurrentUserId")
@@ -295,8 +621,7 @@ def cmd_import_token(client, args):
         roles = data.get("@ShkoloStore:CurrentUserRoles")
 
         if not token:
-            print("Error: No token found in app storage.", file=sys.stderr)
-            sys.exit(1)
+            _die("Error: No token found in app storage.")
 
         client.token = token
         client.user_data = {
@@ -314,8 +639,7 @@ def cmd_import_token(client, args):
         print(f"Role ID: {roles}")
 
     except (json.JSONDecodeError, IOError) as e:
-        print(f"Error reading app data: {e}", file=sys.stderr)
-        sys.exit(1)
+        _die(f"Error reading app data: {e}")
 
 
 def cmd_status(client, args):
@@ -335,8 +659,7 @@ def cmd_status(client, args):
 def cmd_homework(client, args):
     """Get homework."""
     if not client.is_authenticated():
-        print("Error: Not authenticated. Run 'shkolo-cli login' first.", file=sys.stderr)
-        sys.exit(1)
+        _die("Error: Not authenticated. Run 'shkolo-cli login' first.")
 
     print("=" * 60)
     print("SHKOLO - Homework")
@@ -344,48 +667,61 @@ def cmd_homework(client, args):
     print()
 
     # Get pupils (for parent accounts)
-    response, status = client.request("GET", "/v1/diary/pupils")
-    if status != 200:
+    child_pupils = client.list_pupils()
+    if child_pupils is None:
         print("Could not fetch pupils data")
         return
 
-    pupils_data = response
-    child_pupils = pupils_data.get("childPupils", {})
-
     if not child_pupils:
         print("No children found. This might be a student account.")
         cmd_homework_student(client, args)
         return
 
-    for pupil_id, pupil in child_pupils.items():
-        name = pupil.get("target_name", "Unknown")
+    # Get homework courses (grouped by subject) for all children at once
+    courses_results = client.get_many(
+        ["/v1/diary/homeworks/courses"] * len(child_pupils),
+        params=[{"pupilId": pupil_id} for pupil_id, _ in child_pupils]
+    )
 
+    # Only courses that actually have homework need a list request;
+    # None marks a child whose courses could not be fetched
+    pupil_courses = []
+    for response, status in courses_results:
+        if status != 200 or not response:
+            pupil_courses.append(None)
+            continue
+
+        courses = response.get("courses", [])
+        hw_counts = response.get("cycGroupHomeworksCount", {})
+        # Keys are stringified cyc_group_ids; normalise once and drop empty courses
+        hw_counts_int = {int(k): v for k, v in hw_counts.items() if v}
+        pupil_courses.append([
+            (course.get("course_short_name", course.get("course_name", "Unknown")), cyc_group_id)
+            for course in courses
+            if (cyc_group_id := course.get("cyc_group_id")) in hw_counts_int
+        ])
+
+    # Fetch the homework of every course of every child in one fan-out
+    hw_results = iter(client.get_many(
+        (f"/v1/diary/homeworks/list/{cyc_group_id}"
+         for to_fetch in pupil_courses if to_fetch
+         for _, cyc_group_id in to_fetch),
+        ttl=HOMEWORK_LIST_TTL
+    ))
+
+    for (_, name), to_fetch in zip(child_pupils, pupil_courses):
         print(f"👤 {name}")
         print("=" * 40)
 
-        # Get homework courses (grouped by subject)
-        response, status = client.request("GET", f"/v1/diary/homeworks/courses?pupilId={pupil_id}")
-        if status != 200:
+        if to_fetch is None:
             print("   Could not fetch homework data.")
             continue
 
-        courses = response.get("courses", [])
-        hw_counts = response.get("cycGroupHomeworksCount", {})
-
         # Collect all homework from all courses
         all_homework = []
 
-        for course in courses:
-            cyc_group_id = course.get("cyc_group_id")
-            course_name = course.get("course_short_name", course.get("course_name", "Unknown"))
-            hw_count = hw_counts.get(str(cyc_group_id), 0)
-
-            if hw_count == 0:
-                continue
-
-            # Fetch homework for this course
-            hw_response, hw_status = client.request("GET", f"/v1/diary/homeworks/list/{cyc_group_id}")
-            if hw_status == 200:
+        for (course_name, _), (hw_response, hw_status) in zip(to_fetch, hw_results):
+            if hw_status == 200 and hw_response:
                 for hw in hw_response.get("homeworks", []):
                     all_homework.append({
                         "date": hw.get("shi_date", "N/A"),
@@ -396,11 +732,8 @@ def cmd_homework(client, args):
                     })
 
         if all_homework:
-            # Sort by date, newest first
-            sorted_hw = sorted(all_homework, key=lambda x: x["date_sort"], reverse=True)
-
-            # Show last 20 homework items
-            for hw in sorted_hw[:20]:
+            # Show last 20 homework items, newest first
+            for hw in heapq.nlargest(20, all_homework, key=operator.itemgetter("date_sort")):
                 due_str = f" → Due: {hw['due']}" if hw.get('due') else ""
                 print(f"\n   [{hw['date']}] {hw['subject']}{due_str}")
                 print(f"   📝 {hw['text']}")
@@ -421,10 +754,10 @@ def cmd_homework(client, args):
 def cmd_homework_student(client, args):
     """Get homework for student account."""
     # Try getting schedule for current user
-    today = datetime.now().strftime("%Y-%m-%d")
-    response, status = client.request("GET", f"/v1/diary/scheduleHours?date={today}")
+    today = today_iso()
+    response, status = client.request("GET", "/v1/diary/scheduleHours", params={"date": today})
 
-    if status == 200:
+    if status == 200 and response:
         hours = response.get("scheduleHours", response.get("data", []))
         if hours:
             print(f"\n📅 Today's Schedule:")
@@ -436,7 +769,7 @@ def cmd_homework_student(client, args):
 
     # Get assigned tasks
     response, status = client.request("GET", "/v1/tasks/assigned")
-    if status == 200:
+    if status == 200 and response:
         tasks = response.get("assigned", response.get("data", []))
         if tasks:
             print(f"\n📋 Assigned Tasks:")
@@ -446,45 +779,12 @@ def cmd_homework_student(client, args):
                     print(f"     Due: {task['deadline']}")
 
 
-def cmd_homework_legacy(client, args):
-    """Legacy homework function."""
-    # Also try getting from pupils (for parent accounts)
-    pupils = client.get_pupils()
-    if pupils:
-        items = pupils if isinstance(pupils, list) else pupils.get("data", [])
-
-        for pupil in items[:3]:
-            pupil_id = pupil.get("id")
-            pupil_name = pupil.get("names", pupil.get("name", f"Pupil {pupil_id}"))
-
-            # Get schedule to find homework
-            today = datetime.now()
-            for day_offset in range(7):  # Check next 7 days
-                date = (today + timedelta(days=day_offset)).strftime("%Y-%m-%d")
-                schedule = client.get_pupil_schedule(pupil_id, date)
-
-                if schedule:
-                    hours = schedule if isinstance(schedule, list) else schedule.get("data", schedule.get("hours", []))
-
-                    for hour in hours:
-                        if hour.get("homework"):
-                            hw = hour["homework"]
-                            if day_offset == 0:
-                                print(f"=== Today's Homework for {pupil_name} ===")
-                            else:
-                                print(f"=== Homework for {pupil_name} ({date}) ===")
-                            print(f"Subject: {hour.get('course_name', 'N/A')}")
-                            print(f"Homework: {hw.get('description', hw.get('text', hw))}")
-                            print("-" * 40)
-
-
 def cmd_schedule(client, args):
     """Get schedule."""
     if not client.is_authenticated():
-        print("Error: Not authenticated. Run 'shkolo-cli login' first.", file=sys.stderr)
-        sys.exit(1)
+        _die("Error: Not authenticated. Run 'shkolo-cli login' first.")
 
-    date = args.date or datetime.now().strftime("%Y-%m-%d")
+    date = args.date or today_iso()
 
     print("=" * 60)
     print(f"SHKOLO - Schedule for {date}")
@@ -492,17 +792,15 @@ def cmd_schedule(client, args):
     print()
 
     # Get pupils (for parent accounts)
-    response, status = client.request("GET", "/v1/diary/pupils")
-    if status != 200:
+    child_pupils = client.list_pupils()
+    if child_pupils is None:
         print("Could not fetch data")
         return
 
-    child_pupils = response.get("childPupils", {})
-
     if not child_pupils:
         # Try as student account
-        response, status = client.request("GET", f"/v1/diary/scheduleHours?date={date}")
-        if status == 200:
+        response, status = client.request("GET", "/v1/diary/scheduleHours", params={"date": date})
+        if status == 200 and response:
             hours = response.get("scheduleHours", [])
             if hours:
                 print("📅 My Schedule:\n")
@@ -514,15 +812,17 @@ def cmd_schedule(client, args):
                         print(f"      📝 Homework: {hour['homework_text']}")
         return
 
-    for pupil_id, pupil in child_pupils.items():
-        name = pupil.get("target_name", "Unknown")
+    results = client.get_many(
+        (f"/v1/diary/pupils/{pupil_id}/scheduleHours" for pupil_id, _ in child_pupils),
+        params={"date": date},
+        ttl=SCHEDULE_TTL
+    )
 
+    for (_, name), (response, status) in zip(child_pupils, results):
         print(f"👤 {name}")
         print("-" * 40)
 
-        response, status = client.request("GET", f"/v1/diary/pupils/{pupil_id}/scheduleHours?date={date}")
-
-        if status == 200:
+        if status == 200 and response:
             hours = response.get("scheduleHours", [])
             if hours:
                 for hour in sorted(hours, key=lambda x: x.get("school_hour", 0)):
@@ -541,8 +841,7 @@ def cmd_schedule(client, args):
 def cmd_grades(client, args):
     """Get grades."""
     if not client.is_authenticated():
-        print("Error: Not authenticated. Run 'shkolo-cli login' first.", file=sys.stderr)
-        sys.exit(1)
+        _die("Error: Not authenticated. Run 'shkolo-cli login' first.")
 
     print("=" * 60)
     print("SHKOLO - Grades Summary")
@@ -550,26 +849,25 @@ def cmd_grades(client, args):
     print()
 
     # Get pupils (for parent accounts)
-    response, status = client.request("GET", "/v1/diary/pupils")
-    if status != 200:
+    child_pupils = client.list_pupils()
+    if child_pupils is None:
         print("Could not fetch data")
         return
 
-    child_pupils = response.get("childPupils", {})
-
     if not child_pupils:
         print("No children found (student accounts not yet supported for grades)")
         return
 
-    for pupil_id, pupil in child_pupils.items():
-        name = pupil.get("target_name", "Unknown")
+    # Get grades summaries for all children at once
+    results = client.get_many(
+        (f"/v1/diary/pupils/{pupil_id}/grades/summary" for pupil_id, _ in child_pupils),
+        ttl=GRADES_TTL
+    )
 
+    for (_, name), (response, status) in zip(child_pupils, results):
         print(f"👤 {name}")
         print("=" * 40)
 
-        # Get grades summary
-        response, status = client.request("GET", f"/v1/diary/pupils/{pupil_id}/grades/summary")
-
         if status == 200 and response:
             grades_data = response.get("grades", response.get("courses", []))
             if grades_data:
@@ -578,84 +876,14 @@ def cmd_grades(client, args):
                     course_name = course.get("target_name", course.get("course_name", "Unknown"))
 
                     # Extract grades from term1 and term2
-                    term1_grades = []
-                    term2_grades = []
-
-                    term1 = course.get("term1", {})
-                    term2 = course.get("term2", {})
-
-                    # Icon to emoji mapping for junior grades
-                    icon_map = {
-                        "starO": "⭐",
-                        "star": "⭐",
-                        "heartO": "❤️",
-                        "heart": "❤️",
-                        "smileO": "😊",
-                        "smile": "😊",
-                        "mehO": "😐",
-                        "meh": "😐",
-                        "frownO": "😟",
-                        "frown": "😟",
-                    }
-
-                    def extract_grade(grade_info):
-                        """Extract grade value, handling both numeric and icon-based systems."""
-                        if not isinstance(grade_info, dict):
-                            return str(grade_info) if grade_info else None
-                        # Try numeric grade first
-                        g = grade_info.get("grade") or grade_info.get("grade_raw")
-                        if g:
-                            return str(g)
-                        # For junior grades, use numerical_value (the actual grade number)
-                        num = grade_info.get("numerical_value")
-                        if num:
-                            return str(num)
-                        return None
-
-                    # term1/term2 can be dict or list
-                    if isinstance(term1, dict):
-                        for grade_id, grade_info in term1.items():
-                            g = extract_grade(grade_info)
-                            if g:
-                                term1_grades.append(g)
-                    elif isinstance(term1, list):
-                        for grade_info in term1:
-                            g = extract_grade(grade_info)
-                            if g:
-                                term1_grades.append(g)
-
-                    if isinstance(term2, dict):
-                        for grade_id, grade_info in term2.items():
-                            g = extract_grade(grade_info)
-                            if g:
-                                term2_grades.append(g)
-                    elif isinstance(term2, list):
-                        for grade_info in term2:
-                            g = extract_grade(grade_info)
-                            if g:
-                                term2_grades.append(g)
+                    term1_grades = [g for g in map(extract_grade, iter_grade_container(course.get("term1", {}))) if g]
+                    term2_grades = [g for g in map(extract_grade, iter_grade_container(course.get("term2", {}))) if g]
 
                     # Get term final grades - can be dict or list
                     term1_final = course.get("term1final", {})
                     term2_final = course.get("term2final", {})
                     annual = course.get("annual", {})
 
-                    def extract_final_grade(final_data):
-                        """Extract grade value from final grade data."""
-                        if not final_data:
-                            return None
-                        if isinstance(final_data, dict):
-                            for key, val in final_data.items():
-                                if isinstance(val, dict):
-                                    return val.get("grade")
-                                return val
-                        elif isinstance(final_data, list):
-                            for item in final_data:
-                                if isinstance(item, dict):
-                                    return item.get("grade")
-                                return item
-                        return str(final_data)
-
                     t1_final = extract_final_grade(term1_final)
                     t2_final = extract_final_grade(term2_final)
                     ann_final = extract_final_grade(annual)
@@ -665,7 +893,7 @@ def cmd_grades(client, args):
                         print(f"   📚 {course_name}")
                         if term1_grades:
                             # Check if numeric grades (for averaging)
-                            numeric = [float(g) for g in term1_grades if g.replace('.','').isdigit()]
+                            numeric = numeric_grades(term1_grades)
                             if numeric:
                                 avg = sum(numeric) / len(numeric)
                                 print(f"      Term 1: {', '.join(term1_grades)} (avg: {avg:.2f})")
@@ -674,7 +902,7 @@ def cmd_grades(client, args):
                         if t1_final:
                             print(f"      Term 1 Final: {t1_final}")
                         if term2_grades:
-                            numeric = [float(g) for g in term2_grades if g.replace('.','').isdigit()]
+                            numeric = numeric_grades(term2_grades)
                             if numeric:
                                 avg = sum(numeric) / len(numeric)
                                 print(f"      Term 2: {', '.join(term2_grades)} (avg: {avg:.2f})")
@@ -693,54 +921,11 @@ def cmd_grades(client, args):
         print("-" * 60)
         print()
 
-    # Legacy fallback code below
-    return
-    pupils_legacy = client.get_pupils()
-    if pupils_legacy:
-        items = pupils_legacy if isinstance(pupils_legacy, list) else pupils_legacy.get("data", [])
-
-        for pupil in items:
-            pupil_id = pupil.get("id")
-            pupil_name = pupil.get("names", pupil.get("name", f"Pupil {pupil_id}"))
-
-            grades = client.get_grades(pupil_id)
-            if grades:
-                print(f"=== Grades for {pupil_name} ===\n")
-
-                grade_items = grades if isinstance(grades, list) else grades.get("data", grades.get("grades", grades.get("courses", [])))
-
-                if isinstance(grade_items, list):
-                    for item in grade_items:
-                        course = item.get("course_name", item.get("discipline", item.get("name", "N/A")))
-                        avg = item.get("average", item.get("avg", ""))
-                        term1 = item.get("term1", item.get("first_term", ""))
-                        term2 = item.get("term2", item.get("second_term", ""))
-                        annual = item.get("annual", item.get("year", ""))
-
-                        print(f"{course}:")
-                        if avg:
-                            print(f"  Average: {avg}")
-                        if term1:
-                            print(f"  Term 1: {term1}")
-                        if term2:
-                            print(f"  Term 2: {term2}")
-                        if annual:
-                            print(f"  Annual: {annual}")
-
-                        # Show individual grades if available
-                        if item.get("grades"):
-                            grade_list = [str(g.get("grade", g)) for g in item["grades"][:10]]
-                            print(f"  Grades: {', '.join(grade_list)}")
-                elif isinstance(grade_items, dict):
-                    print(json.dumps(grade_items, indent=2, ensure_ascii=False))
-                print()
-
 
 def cmd_notifications(client, args):
     """Get notifications."""
     if not client.is_authenticated():
-        print("Error: Not authenticated. Run 'shkolo-cli login' first.", file=sys.stderr)
-        sys.exit(1)
+        _die("Error: Not authenticated. Run 'shkolo-cli login' first.")
 
     notifications = client.get_notifications()
     if notifications:
@@ -768,8 +953,7 @@ def cmd_notifications(client, args):
 def cmd_events(client, args):
     """Get events."""
     if not client.is_authenticated():
-        print("Error: Not authenticated. Run 'shkolo-cli login' first.", file=sys.stderr)
-        sys.exit(1)
+        _die("Error: Not authenticated. Run 'shkolo-cli login' first.")
 
     events = client.get_events(school_calendar=args.calendar)
     if events:
@@ -798,31 +982,58 @@ def cmd_events(client, args):
 def cmd_raw(client, args):
     """Make a raw API request."""
     if not client.is_authenticated():
-        print("Error: Not authenticated. Run 'shkolo-cli login' first.", file=sys.stderr)
-        sys.exit(1)
+        _die("Error: Not authenticated. Run 'shkolo-cli login' first.")
 
-    method = args.method.upper()
-    endpoint = args.endpoint if args.endpoint.startswith("/") else f"/{args.endpoint}"
+    # Both argument parsers only accept upper-case methods
+    method = args.method
+    endpoint = args.endpoint
+    if endpoint[:1] != "/":
+        endpoint = "/" + endpoint
 
     data = None
     if args.data:
         try:
-            data = json.loads(args.data)
+            data = _loads(args.data)
         except json.JSONDecodeError:
-            print("Error: Invalid JSON data", file=sys.stderr)
-            sys.exit(1)
+            _die("Error: Invalid JSON data")
 
     response, status = client.request(method, endpoint, data)
 
-    print(f"Status: {status}")
-    print(json.dumps(response, indent=2, ensure_ascii=False))
+    # Write bytes directly instead of decoding them for print()
+    out = sys.stdout.buffer
+    out.write(b"Status: %d\n" % status)
+    # Pretty-print for people, compact JSON when piped into another tool
+    _dump_to(out, response, indent=sys.stdout.isatty())
+    out.write(b"\n")
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Shkolo CLI - Command-line client for Shkolo API",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+# Output of `shkolo-cli --help` (at 80 columns), pre-encoded and printed
+# without building the argparse tree. Keep in sync with build_parser();
+# CI fails when the two differ.
+_HELP_BYTES = b"""\
+usage: shkolo-cli [-h]
+                  {import-token,login,logout,status,homework,schedule,grades,notifications,events,raw}
+                  ...
+
+Shkolo CLI - Command-line client for Shkolo API
+
+positional arguments:
+  {import-token,login,logout,status,homework,schedule,grades,notifications,events,raw}
+                        Available commands
+    import-token        Import token from iOS Shkolo app
+    login               Login to Shkolo with credentials
+    logout              Logout from Shkolo
+    status              Show authentication status
+    homework            Get homework assignments
+    schedule            Get schedule
+    grades              Get grades
+    notifications       Get notifications
+    events              Get events
+    raw                 Make a raw API request
+
+options:
+  -h, --help            show this help message and exit
+
 Examples:
   shkolo-cli import-token        # Import token from iOS app (recommended)
   shkolo-cli login               # Login with username/password
@@ -831,73 +1042,338 @@ Examples:
   shkolo-cli schedule --date 2024-02-20
   shkolo-cli grades
   shkolo-cli raw GET /v1/diary/pupils
-        """
-    )
+  shkolo-cli --serve             # Serve commands for shkolo-cli-client
+"""
 
-    subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
-    # Import token command
+_DESCRIPTION = "Shkolo CLI - Command-line client for Shkolo API"
+_EPILOG = """
+Examples:
+  shkolo-cli import-token        # Import token from iOS app (recommended)
+  shkolo-cli login               # Login with username/password
+  shkolo-cli homework            # Get homework and schedule
+  shkolo-cli schedule            # Get today's schedule
+  shkolo-cli schedule --date 2024-02-20
+  shkolo-cli grades
+  shkolo-cli raw GET /v1/diary/pupils
+  shkolo-cli --serve             # Serve commands for shkolo-cli-client
+"""
+
+
+def _build_import_token_parser(subparsers):
     subparsers.add_parser("import-token", help="Import token from iOS Shkolo app")
 
-    # Login command
+
+def _build_login_parser(subparsers):
     login_parser = subparsers.add_parser("login", help="Login to Shkolo with credentials")
     login_parser.add_argument("-u", "--username", help="Username/email")
     login_parser.add_argument("-p", "--password", help="Password (not recommended, use prompt)")
 
-    # Logout command
+
+def _build_logout_parser(subparsers):
     subparsers.add_parser("logout", help="Logout from Shkolo")
 
-    # Status command
+
+def _build_status_parser(subparsers):
     subparsers.add_parser("status", help="Show authentication status")
 
-    # Homework command
+
+def _build_homework_parser(subparsers):
     subparsers.add_parser("homework", help="Get homework assignments")
 
-    # Schedule command
+
+def _build_schedule_parser(subparsers):
     schedule_parser = subparsers.add_parser("schedule", help="Get schedule")
     schedule_parser.add_argument("-d", "--date", help="Date (YYYY-MM-DD)")
 
-    # Grades command
+
+def _build_grades_parser(subparsers):
     subparsers.add_parser("grades", help="Get grades")
 
-    # Notifications command
+
+def _build_notifications_parser(subparsers):
     subparsers.add_parser("notifications", help="Get notifications")
 
-    # Events command
+
+def _build_events_parser(subparsers):
     events_parser = subparsers.add_parser("events", help="Get events")
     events_parser.add_argument("-c", "--calendar", action="store_true", help="Show school calendar")
 
-    # Raw API request
-    raw_parser = subparsers.add_parser("raw", help="Make a raw API request")
+
+def _build_raw_parser(subparsers):
+    raw_parser = subparsers.add_parser(
+        "raw",
+        help="Make a raw API request",
+        description="Make a raw API request. The JSON response is pretty-printed "
+                    "on a terminal and written compactly when output is piped."
+    )
     raw_parser.add_argument("method", choices=["GET", "POST", "PUT", "DELETE"], help="HTTP method")
     raw_parser.add_argument("endpoint", help="API endpoint (e.g., /v1/diary/pupils)")
     raw_parser.add_argument("-d", "--data", help="JSON data for POST/PUT")
 
-    args = parser.parse_args()
 
-    if not args.command:
-        parser.print_help()
-        sys.exit(0)
+# Subcommand name -> function registering its subparser, in help order
+_SUBCMD_BUILDERS = {
+    "import-token": _build_import_token_parser,
+    "login": _build_login_parser,
+    "logout": _build_logout_parser,
+    "status": _build_status_parser,
+    "homework": _build_homework_parser,
+    "schedule": _build_schedule_parser,
+    "grades": _build_grades_parser,
+    "notifications": _build_notifications_parser,
+    "events": _build_events_parser,
+    "raw": _build_raw_parser,
+}
 
-    client = ShkoloClient()
 
-    commands = {
-        "import-token": cmd_import_token,
-        "login": cmd_login,
-        "logout": cmd_logout,
-        "status": cmd_status,
-        "homework": cmd_homework,
-        "schedule": cmd_schedule,
-        "grades": cmd_grades,
-        "notifications": cmd_notifications,
-        "events": cmd_events,
-        "raw": cmd_raw,
+def build_parser(builders):
+    """Build the top-level parser with the given subcommand builders."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="shkolo-cli",
+        description=_DESCRIPTION,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=_EPILOG
+    )
+
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    for builder in builders:
+        builder(subparsers)
+    return parser
+
+
+# Subcommand -> (positional names, {flag: (dest, takes_value)}) for parse_argv_fast().
+# Must declare every option of the _build_*_parser() functions; CI checks this.
+_FAST_ARGV_SPECS = {
+    "import-token": ((), {}),
+    "login": ((), {
+        "-u": ("username", True), "--username": ("username", True),
+        "-p": ("password", True), "--password": ("password", True),
+    }),
+    "logout": ((), {}),
+    "status": ((), {}),
+    "homework": ((), {}),
+    "schedule": ((), {"-d": ("date", True), "--date": ("date", True)}),
+    "grades": ((), {}),
+    "notifications": ((), {}),
+    "events": ((), {"-c": ("calendar", False), "--calendar": ("calendar", False)}),
+    "raw": (("method", "endpoint"), {"-d": ("data", True), "--data": ("data", True)}),
+}
+_RAW_METHODS = ("GET", "POST", "PUT", "DELETE")
+
+
+def parse_argv_fast(argv):
+    """Parse well-formed command lines without argparse.
+
+    Returns None for anything else (help, abbreviations, errors) so the
+    caller can fall back to the argparse parser and its messages.
+    """
+    if not argv or argv[0] not in _FAST_ARGV_SPECS:
+        return None
+    positionals, flags = _FAST_ARGV_SPECS[argv[0]]
+    values = {dest: None if takes_value else False for dest, takes_value in flags.values()}
+    values.update(dict.fromkeys(positionals))
+    found = []
+
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        if arg.startswith("-") and arg != "-":
+            name, eq, value = arg.partition("=")
+            if name not in flags:
+                return None
+            dest, takes_value = flags[name]
+            if not takes_value:
+                if eq:
+                    return None
+                values[dest] = True
+            elif eq:
+                values[dest] = value
+            elif i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+                i += 1
+                values[dest] = argv[i]
+            else:
+                return None
+        else:
+            found.append(arg)
+        i += 1
+
+    if len(found) != len(positionals):
+        return None
+    values.update(zip(positionals, found))
+    if argv[0] == "raw" and values["method"] not in _RAW_METHODS:
+        return None
+    return SimpleNamespace(command=argv[0], **values)
+
+
+def parse_args(argv):
+    """Parse command-line arguments (without the program name)."""
+    # Fast path: bare invocation and top-level help need no parser at all
+    if not argv or argv[0] in ("-h", "--help"):
+        sys.stdout.buffer.write(_HELP_BYTES)
+        sys.exit(0)
+
+    args = parse_argv_fast(argv)
+    if args is None:
+        # Only register the invoked subcommand; unknown input gets the full
+        # parser so argparse can report it with the complete list of choices
+        builder = _SUBCMD_BUILDERS.get(argv[0])
+        parser = build_parser([builder] if builder else _SUBCMD_BUILDERS.values())
+        args = parser.parse_args(argv)
+
+        if not args.command:
+            parser.print_help()
+            sys.exit(0)
+    return args
+
+
+def dispatch(client, args):
+    """Run the command selected by args."""
+    command = args.command
+    if command == "homework":
+        cmd_homework(client, args)
+    elif command == "schedule":
+        cmd_schedule(client, args)
+    elif command == "grades":
+        cmd_grades(client, args)
+    elif command == "raw":
+        cmd_raw(client, args)
+    elif command == "notifications":
+        cmd_notifications(client, args)
+    elif command == "events":
+        cmd_events(client, args)
+    elif command == "status":
+        cmd_status(client, args)
+    elif command == "login":
+        cmd_login(client, args)
+    elif command == "logout":
+        cmd_logout(client, args)
+    elif command == "import-token":
+        cmd_import_token(client, args)
+
+
+def run_captured(client, argv):
+    """Run one command, capturing its exit code and output."""
+    import io
+
+    stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8", write_through=True)
+    stderr = io.TextIOWrapper(io.BytesIO(), encoding="utf-8", write_through=True)
+    saved = sys.stdin, sys.stdout, sys.stderr
+    # There is no terminal to prompt on: input() sees EOF instead of blocking
+    sys.stdin, sys.stdout, sys.stderr = io.StringIO(), stdout, stderr
+    code = 0
+    try:
+        args = parse_args(argv)
+        if args.command == "login" and not (args.username and args.password):
+            _die("Error: login needs --username and --password when run through the server")
+        client.reload_token()
+        try:
+            dispatch(client, args)
+        finally:
+            client.flush_cache()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        # A failing command must not take the server down with it
+        sys.stderr.write(f"Error: {e}\n")
+        code = 1
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved
+
+    return {
+        "code": code,
+        "stdout": stdout.buffer.getvalue().decode("utf-8", "replace"),
+        "stderr": stderr.buffer.getvalue().decode("utf-8", "replace")
     }
 
-    if args.command in commands:
-        commands[args.command](client, args)
+
+def serve(socket_path):
+    """Serve commands over a Unix socket with one long-lived client.
+
+    Each connection sends a JSON array of arguments and receives a JSON
+    object with the command's exit code, stdout and stderr. The HTTP
+    session, its pooled connections and the response cache are reused
+    across commands.
+    """
+    import socket
+    import stat
+
+    socket_path = Path(socket_path)
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = socket_path.lstat().st_mode
+    except FileNotFoundError:
+        pass
     else:
-        parser.print_help()
+        if not stat.S_ISSOCK(mode):
+            _die(f"Error: {socket_path} exists and is not a socket")
+        # Only replace a socket left behind by a server that is gone
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(str(socket_path))
+            except ConnectionRefusedError:
+                socket_path.unlink(missing_ok=True)
+            else:
+                _die(f"Error: A server is already running on {socket_path}")
+
+    client = ShkoloClient()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # The socket acts with the user's session, so it is owner-only from the start
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(str(socket_path))
+    finally:
+        os.umask(old_umask)
+    server.listen()
+    print(f"Serving on {socket_path} (Ctrl-C to stop)", file=sys.stderr)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                # A client that never finishes its request must not stall the server
+                conn.settimeout(SERVE_CLIENT_TIMEOUT)
+                try:
+                    with conn.makefile("rb") as f:
+                        request = f.read()
+                except OSError:
+                    continue
+                try:
+                    argv = _loads(request)
+                    if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+                        raise ValueError("expected a JSON array of strings")
+                except ValueError as e:
+                    reply = {"code": 2, "stdout": "", "stderr": f"Error: Invalid request: {e}\n"}
+                else:
+                    reply = run_captured(client, argv)
+                try:
+                    conn.sendall(_dumps(reply))
+                except OSError:
+                    pass  # The client went away, e.g. Ctrl-C during a slow command
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        socket_path.unlink(missing_ok=True)
+
+
+def main():
+    argv = sys.argv[1:]
+    if argv[:1] == ["--serve"]:
+        if len(argv) > 2 or (len(argv) == 2 and argv[1].startswith("-")):
+            _die("Usage: shkolo-cli --serve [SOCKET]")
+        serve(argv[1] if len(argv) == 2 else SOCKET_FILE)
+        return
+
+    args = parse_args(argv)
+    client = ShkoloClient()
+    try:
+        dispatch(client, args)
+    finally:
+        client.flush_cache()
 
 
 if __name__ == "__main__":